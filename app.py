@@ -1,5 +1,21 @@
 import os
-from flask import Flask, render_template, request, url_for, redirect, flash, jsonify, send_file
+import csv
+import gzip
+import hashlib
+import json
+import math
+import mimetypes
+import random
+import sys
+import tempfile
+import threading
+import unicodedata
+import uuid
+import click
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from flask import Flask, Response, g, render_template, request, url_for, redirect, flash, jsonify, send_file, send_from_directory, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
@@ -7,7 +23,10 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
 from datetime import datetime, date, timedelta, time
 from functools import wraps
-from sqlalchemy import func
+from sqlalchemy import case, func, or_, select, update, delete
+from sqlalchemy.orm import validates
+from sqlalchemy.exc import IntegrityError
+from itsdangerous import URLSafeTimedSerializer, BadSignature
 
 # Importa as bibliotecas para gerar PDF
 from reportlab.pdfgen import canvas
@@ -18,6 +37,24 @@ from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet
 import io
 
+# Brotli é opcional: sem ele os assets e a API usam apenas gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# orjson é opcional: serializa o payload compacto da escala bem mais rápido que o json padrão
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# openpyxl é opcional: sem ele a exportação fica disponível apenas em CSV
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
 load_dotenv()
 
 # --- 1. CONFIGURAÇÃO ---
@@ -36,6 +73,45 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
     "pool_pre_ping": True,
 }
 
+# Limite de requisições por usuário/IP (token bucket guardado no banco, vale para todos os workers)
+app.config['RATE_LIMIT_ENABLED'] = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+
+# Atrás do proxy do Render o IP real do cliente vem no X-Forwarded-For; sem isso, o limite de login
+# por IP trataria todos os clientes como um só. Ao rodar sem proxy na frente, defina BEHIND_PROXY=0,
+# senão qualquer cliente poderia escolher o próprio IP pelo cabeçalho.
+if os.environ.get('BEHIND_PROXY', '1') == '1':
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+
+# Assets com hash no nome (gerados por `flask build-assets`) e compressão das respostas JSON
+ASSETS_ESTATICOS = ['script.js', 'style.css']
+app.config['STATIC_DIST_FOLDER'] = os.path.join(app.static_folder, 'dist')
+app.config['COMPRESS_MIN_SIZE'] = 500
+
+# Por quanto tempo a lista de vagas abertas de um conjunto de habilidades fica em cache no worker
+app.config['VAGAS_ABERTAS_CACHE_SECONDS'] = int(os.environ.get('VAGAS_ABERTAS_CACHE_SECONDS', '10'))
+
+# Hash de senhas: parâmetros no formato do Werkzeug (ex.: "scrypt:32768:8:1" ou "pbkdf2:sha256:1000000").
+# Senhas com parâmetros diferentes são refeitas no próximo login bem-sucedido.
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+# Prefixo que o Werkzeug grava para essa política ("scrypt" vira "scrypt:32768:8:1"), calculado uma vez
+PREFIXO_HASH_SENHA = generate_password_hash('', method=app.config['PASSWORD_HASH_METHOD']).split('$', 1)[0]
+# Verificações de senha simultâneas por worker e quantas podem aguardar na fila (0 workers = verifica na própria requisição).
+# Com a fila cheia, o login espera até LOGIN_HASH_TIMEOUT segundos por uma vaga antes de responder 503.
+# O pool só protege as outras rotas com workers de várias threads (gthread, ver gunicorn.conf.py): no worker
+# "sync" a requisição de login continua ocupando o worker inteiro enquanto espera o hash.
+app.config['LOGIN_HASH_WORKERS'] = int(os.environ.get('LOGIN_HASH_WORKERS', '2'))
+app.config['LOGIN_HASH_QUEUE'] = int(os.environ.get('LOGIN_HASH_QUEUE', '8'))
+app.config['LOGIN_HASH_TIMEOUT'] = float(os.environ.get('LOGIN_HASH_TIMEOUT', '10'))
+
+# Período (em segundos) em que uma vaga liberada recebe interessados antes de ser atribuída; 0 desativa
+app.config['CLAIM_WINDOW_SECONDS'] = int(os.environ.get('CLAIM_WINDOW_SECONDS', '0'))
+
+# Perfis de requisições amostradas (a taxa é ajustada pelo admin em /admin/perfis)
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', os.path.join(app.instance_path, 'perfis'))
+app.config['PROFILE_MAX_FILES'] = 200
+app.config['PROFILE_INTERVAL'] = 0.005
+
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
 login_manager = LoginManager(app)
@@ -43,25 +119,77 @@ login_manager.login_view = 'login'
 
 
 # --- 2. MODELOS DO BANCO DE DADOS ---
+def normalizar_busca(texto):
+    """Minúsculas e sem acentos ("José Álvares" -> "jose alvares"), para buscas indexadas."""
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).casefold().strip()
+
+def termos_busca(nome, email):
+    """Cada palavra do nome e o email inteiro, normalizados, para buscar por prefixo de qualquer palavra."""
+    return set(normalizar_busca(nome).split()) | ({normalizar_busca(email)} if email else set())
+
 usuario_habilidades = db.Table('usuario_habilidades',
     db.Column('usuario_id', db.Integer, db.ForeignKey('usuario.id'), primary_key=True),
-    db.Column('habilidade_id', db.Integer, db.ForeignKey('habilidade.id'), primary_key=True)
+    db.Column('habilidade_id', db.Integer, db.ForeignKey('habilidade.id'), primary_key=True),
+    db.Index('ix_usuario_habilidades_habilidade_id', 'habilidade_id')
 )
 
+# Um BIGINT com sinal guarda 63 bits, então a máscara comporta habilidades com id de 1 a 63
+MAX_HABILIDADE_ID = 63
+
+def bit_habilidade(habilidade_id):
+    """Bit da habilidade na máscara do usuário."""
+    if not 1 <= habilidade_id <= MAX_HABILIDADE_ID:
+        raise ValueError(f"Habilidade {habilidade_id} não cabe na máscara de habilidades (ids de 1 a {MAX_HABILIDADE_ID}).")
+    return 1 << (habilidade_id - 1)
+
+def habilidades_da_mascara(mascara):
+    return [i + 1 for i in range(mascara.bit_length()) if mascara >> i & 1]
+
 class Habilidade(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     funcao = db.Column(db.String(100), unique=True, nullable=False)
 
+@db.event.listens_for(Habilidade, 'after_insert')
+def _verifica_limite_habilidade(mapper, connection, habilidade):
+    # Falha o flush (e desfaz a transação) em vez de criar uma habilidade sem bit na máscara
+    bit_habilidade(habilidade.id)
+
 class Usuario(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
+    # Nome normalizado (sem acentos, minúsculo) mantido automaticamente para a busca do painel
+    nome_busca = db.Column(db.String(100), nullable=False, index=True)
     email = db.Column(db.String(100), unique=True, nullable=False)
     senha_hash = db.Column(db.String(256), nullable=False)
     is_admin = db.Column(db.Boolean, default=False, nullable=False)
     habilidades = db.relationship('Habilidade', secondary=usuario_habilidades, lazy='subquery',
                                   backref=db.backref('usuarios', lazy=True))
-    def set_password(self, password): self.senha_hash = generate_password_hash(password)
-    def check_password(self, password): return check_password_hash(self.senha_hash, password)
+    # Cópia das habilidades como bits, para checar elegibilidade com uma operação de inteiros (também em SQL)
+    habilidades_mascara = db.Column(db.BigInteger, default=0, nullable=False)
+    def atualizar_mascara_habilidades(self):
+        self.habilidades_mascara = sum(bit_habilidade(h.id) for h in set(self.habilidades))
+    def pode_servir(self, habilidade_id):
+        return self.is_admin or bool(self.habilidades_mascara & bit_habilidade(habilidade_id))
+    termos = db.relationship('UsuarioTermo', lazy=True, cascade="all, delete-orphan")
+    @validates('nome', 'email')
+    def _atualiza_busca(self, key, valor):
+        if key == 'nome':
+            self.nome_busca = normalizar_busca(valor)
+        nome, email = (valor, self.email) if key == 'nome' else (self.nome, valor)
+        novos = termos_busca(nome, email)
+        # Reaproveita os termos que continuam, para o flush não inserir uma chave antes de apagar a antiga
+        mantidos = [t for t in self.termos if t.termo in novos]
+        self.termos = mantidos + [UsuarioTermo(termo=t) for t in novos - {t.termo for t in mantidos}]
+        return valor
+    def set_password(self, password): self.senha_hash = generate_password_hash(password, method=app.config['PASSWORD_HASH_METHOD'])
+    def precisa_rehash(self): return self.senha_hash.split('$', 1)[0] != PREFIXO_HASH_SENHA
+
+class UsuarioTermo(db.Model):
+    # Palavras do nome e email normalizados (mantidas pelo Usuario), indexadas para a busca por prefixo
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), primary_key=True)
+    termo = db.Column(db.String(100), primary_key=True)
+    __table_args__ = (db.Index('ix_usuario_termo_termo', 'termo', postgresql_ops={'termo': 'varchar_pattern_ops'}),)
 
 class Missa(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -69,13 +197,36 @@ class Missa(db.Model):
     horario = db.Column(db.Time, nullable=False)
     vagas = db.relationship('Vaga', backref='missa', lazy=True, cascade="all, delete-orphan")
     arquivada = db.Column(db.Boolean, default=False, nullable=False)
+    __table_args__ = (db.Index('ix_missa_arquivada_data', 'arquivada', 'data'),)
 
 class Vaga(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    funcao = db.Column(db.String(100), nullable=False)
+    habilidade_id = db.Column(db.Integer, db.ForeignKey('habilidade.id'), nullable=False, index=True)
     missa_id = db.Column(db.Integer, db.ForeignKey('missa.id'), nullable=False)
-    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=True, index=True)
     usuario = db.relationship('Usuario')
+    habilidade = db.relationship('Habilidade', lazy='joined')
+    # Fim do período de disputa de uma vaga recém-liberada (nulo quando não há disputa)
+    disputa_ate = db.Column(db.DateTime, nullable=True, index=True)
+    interesses = db.relationship('InteresseVaga', backref='vaga', lazy=True, cascade="all, delete-orphan")
+    @property
+    def funcao(self): return self.habilidade.funcao
+    # Atende a busca de vagas abertas (usuario_id nulo) por habilidade
+    __table_args__ = (db.Index('ix_vaga_habilidade_id_usuario_id', 'habilidade_id', 'usuario_id'),)
+
+class InteresseVaga(db.Model):
+    # Fila de interessados em uma vaga durante o período de disputa
+    id = db.Column(db.Integer, primary_key=True)
+    vaga_id = db.Column(db.Integer, db.ForeignKey('vaga.id'), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    __table_args__ = (db.UniqueConstraint('vaga_id', 'usuario_id'),)
+
+class LimiteRequisicao(db.Model):
+    # Um balde de tokens por endpoint + usuário + IP
+    chave = db.Column(db.String(200), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    atualizado_em = db.Column(db.Float, nullable=False)
 
 
 # --- 3. FUNÇÕES AUXILIARES E DECORATORS ---
@@ -92,6 +243,518 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def consumir_token(chave, capacidade, por_segundo):
+    """Retira um token do balde `chave`. Retorna (permitido, segundos até o próximo token).
+
+    Usa a conexão da sessão da requisição e faz commit na hora: uma segunda conexão por requisição
+    esgotaria o pool sob carga, e o commit imediato não deixa a linha do balde travada até o fim da rota.
+    """
+    tabela = LimiteRequisicao.__table__
+    agora = datetime.now().timestamp()
+    # Tokens guardados mais a reposição desde a última atualização, limitados à capacidade
+    repostos = tabela.c.tokens + (agora - tabela.c.atualizado_em) * por_segundo
+    disponiveis = case((repostos > capacidade, float(capacidade)), else_=repostos)
+    try:
+        # Decremento condicional em um único UPDATE: atômico também no SQLite, que ignora FOR UPDATE
+        resultado = db.session.execute(
+            tabela.update().where(tabela.c.chave == chave, disponiveis >= 1)
+            .values(tokens=disponiveis - 1, atualizado_em=agora)
+        )
+        permitido, espera = True, 0
+        if not resultado.rowcount:
+            linha = db.session.execute(select(tabela.c.tokens, tabela.c.atualizado_em).where(tabela.c.chave == chave)).first()
+            if linha is None:
+                db.session.execute(tabela.insert().values(chave=chave, tokens=float(capacidade) - 1, atualizado_em=agora))
+            else:
+                tokens = min(float(capacidade), linha.tokens + (agora - linha.atualizado_em) * por_segundo)
+                permitido, espera = False, (1 - tokens) / por_segundo
+        db.session.commit()
+    except IntegrityError:
+        # Outro worker criou o mesmo balde ao mesmo tempo; deixa esta requisição passar
+        db.session.rollback()
+        return True, 0
+    return permitido, espera
+
+def devolver_token(chave, capacidade):
+    """Devolve ao balde `chave` um token retirado por `consumir_token`, sem passar da capacidade."""
+    tabela = LimiteRequisicao.__table__
+    devolvidos = tabela.c.tokens + 1
+    db.session.execute(tabela.update().where(tabela.c.chave == chave)
+                       .values(tokens=case((devolvidos > capacidade, float(capacidade)), else_=devolvidos)))
+    db.session.commit()
+
+def limite_requisicoes(capacidade, por_segundo):
+    """Limita as chamadas da rota por usuário e IP: até `capacidade` seguidas, repondo `por_segundo` tokens."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if app.config['RATE_LIMIT_ENABLED']:
+                usuario = current_user.get_id() if current_user.is_authenticated else 'anonimo'
+                chave = f"{request.endpoint}:{usuario}:{request.remote_addr}"
+                permitido, espera = consumir_token(chave, capacidade, por_segundo)
+                if not permitido:
+                    resposta = jsonify({"status": "erro", "message": "Muitas requisições. Aguarde alguns segundos e tente novamente."})
+                    resposta.status_code = 429
+                    resposta.headers['Retry-After'] = str(math.ceil(espera))
+                    return resposta
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+# Consultas idênticas e simultâneas dentro do mesmo worker são feitas uma única vez
+_consultas_em_andamento = {}
+_consultas_lock = threading.Lock()
+
+def consulta_coalescida(chave, carregar):
+    """Executa `carregar()` uma vez para chamadas concorrentes com a mesma chave; as demais aguardam e reaproveitam o resultado."""
+    with _consultas_lock:
+        pendente = _consultas_em_andamento.get(chave)
+        lider = pendente is None
+        if lider:
+            pendente = {'evento': threading.Event(), 'resultado': None, 'erro': None}
+            _consultas_em_andamento[chave] = pendente
+    if not lider:
+        pendente['evento'].wait()
+        if pendente['erro'] is not None:
+            raise pendente['erro']
+        return pendente['resultado']
+    try:
+        pendente['resultado'] = carregar()
+    except Exception as e:
+        pendente['erro'] = e
+        raise
+    finally:
+        with _consultas_lock:
+            del _consultas_em_andamento[chave]
+        pendente['evento'].set()
+    return pendente['resultado']
+
+def carregar_manifesto_assets():
+    """Lê o mapa nome original -> nome com hash gerado pelo build; vazio se o build não rodou."""
+    caminho = os.path.join(app.config['STATIC_DIST_FOLDER'], 'manifest.json')
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return {}
+
+_manifesto_assets = carregar_manifesto_assets()
+
+@app.url_defaults
+def usar_asset_com_hash(endpoint, values):
+    # url_for('static', filename='script.js') passa a apontar para dist/script.<hash>.js
+    if endpoint == 'static':
+        nome_com_hash = _manifesto_assets.get(values.get('filename'))
+        if nome_com_hash:
+            values['filename'] = 'dist/' + nome_com_hash
+
+def codificacao_aceita(disponiveis=('br', 'gzip')):
+    """Escolhe a melhor compressão aceita pelo cliente entre as disponíveis."""
+    for codificacao in disponiveis:
+        if codificacao == 'br' and brotli is None:
+            continue
+        if request.accept_encodings[codificacao]:
+            return codificacao
+    return None
+
+def servir_estatico(filename):
+    # Arquivos com hash nunca mudam: cache longo e variante pré-comprimida quando houver.
+    # O resto (inclusive dist/manifest.json, que muda a cada build) segue o cache padrão.
+    if not filename.startswith('dist/') or filename[len('dist/'):] not in _manifesto_assets.values():
+        return app.send_static_file(filename)
+    disponiveis = [c for c, ext in (('br', '.br'), ('gzip', '.gz'))
+                   if os.path.isfile(os.path.join(app.static_folder, filename + ext))]
+    codificacao = codificacao_aceita(disponiveis)
+    if codificacao is None:
+        resposta = send_from_directory(app.static_folder, filename, max_age=31536000)
+    else:
+        extensao = '.br' if codificacao == 'br' else '.gz'
+        resposta = send_from_directory(app.static_folder, filename + extensao, max_age=31536000,
+                                       mimetype=mimetypes.guess_type(filename)[0])
+        resposta.headers['Content-Encoding'] = codificacao
+    resposta.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    resposta.vary.add('Accept-Encoding')
+    return resposta
+
+app.view_functions['static'] = servir_estatico
+
+@app.after_request
+def comprimir_json(response):
+    if (response.mimetype != 'application/json' or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    dados = response.get_data()
+    codificacao = codificacao_aceita()
+    if codificacao is None or len(dados) < app.config['COMPRESS_MIN_SIZE']:
+        return response
+    # Compressão na hora: qualidade baixa do brotli (a 11 fica só para o build dos assets)
+    response.set_data(brotli.compress(dados, quality=5) if codificacao == 'br' else gzip.compress(dados, compresslevel=6))
+    response.headers['Content-Encoding'] = codificacao
+    return response
+
+class AmostradorPerfil:
+    """Amostra periodicamente a pilha da thread de uma requisição e conta as consultas SQL dela."""
+    def __init__(self, thread_id, intervalo):
+        self.thread_id = thread_id
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self.consultas = 0
+        self.tempo_consultas = 0.0
+        self.inicio_consulta = None
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+
+    def iniciar(self):
+        self.iniciado_em = datetime.now()
+        self.inicio = perf_counter()
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join()
+        self.duracao = perf_counter() - self.inicio
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.thread_id)
+            pilha = []
+            while frame is not None:
+                codigo = frame.f_code
+                pilha.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+                frame = frame.f_back
+            if pilha:
+                self.pilhas[';'.join(reversed(pilha))] += 1
+
+    def pilhas_colapsadas(self):
+        # Formato "quadro;quadro;quadro contagem", aceito por flamegraph.pl e speedscope
+        return ''.join(f"{pilha} {contagem}\n" for pilha, contagem in self.pilhas.most_common())
+
+# A contagem de consultas só fica registrada no engine enquanto houver alguma requisição sendo perfilada
+_perfil_local = threading.local()
+def _antes_consulta_perfil(conn, cursor, statement, parameters, context, executemany):
+    amostrador = getattr(_perfil_local, 'amostrador', None)
+    if amostrador is not None:
+        amostrador.inicio_consulta = perf_counter()
+
+def _depois_consulta_perfil(conn, cursor, statement, parameters, context, executemany):
+    amostrador = getattr(_perfil_local, 'amostrador', None)
+    if amostrador is not None and amostrador.inicio_consulta is not None:
+        amostrador.consultas += 1
+        amostrador.tempo_consultas += perf_counter() - amostrador.inicio_consulta
+        amostrador.inicio_consulta = None
+
+# Registrados uma só vez; fora de uma requisição perfilada custam apenas um getattr por consulta
+with app.app_context():
+    db.event.listen(db.engine, 'before_cursor_execute', _antes_consulta_perfil)
+    db.event.listen(db.engine, 'after_cursor_execute', _depois_consulta_perfil)
+
+def _serializador_perfil():
+    return URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='perfil-requisicao')
+
+_config_perfil = {'taxa': 0.0, 'lida_em': 0.0}
+
+def taxa_amostragem_perfil():
+    """Fração das requisições a perfilar, relida do disco no máximo a cada 5 segundos."""
+    agora = perf_counter()
+    if agora - _config_perfil['lida_em'] > 5:
+        try:
+            with open(os.path.join(app.config['PROFILE_DIR'], 'config.json'), encoding='utf-8') as arquivo:
+                _config_perfil['taxa'] = float(json.load(arquivo).get('taxa', 0))
+        except (OSError, ValueError):
+            _config_perfil['taxa'] = 0.0
+        _config_perfil['lida_em'] = agora
+    return _config_perfil['taxa']
+
+@app.before_request
+def iniciar_perfil():
+    token = request.headers.get('X-Profile-Token')
+    if token:
+        try:
+            _serializador_perfil().loads(token, max_age=3600)
+        except BadSignature:
+            token = None
+    if not token:
+        taxa = taxa_amostragem_perfil()
+        if taxa <= 0 or random.random() >= taxa:
+            return
+    g.amostrador_perfil = _perfil_local.amostrador = AmostradorPerfil(threading.get_ident(), app.config['PROFILE_INTERVAL'])
+    g.amostrador_perfil.iniciar()
+
+@app.after_request
+def registrar_status_perfil(response):
+    if 'amostrador_perfil' in g:
+        g.status_perfil = response.status_code
+    return response
+
+@app.teardown_request
+def finalizar_perfil(exc=None):
+    amostrador = g.pop('amostrador_perfil', None)
+    if amostrador is None:
+        return
+    amostrador.parar()
+    _perfil_local.amostrador = None
+    try:
+        salvar_perfil(amostrador, g.pop('status_perfil', 500))
+    except OSError as e:
+        app.logger.warning(f"Não foi possível salvar o perfil da requisição: {e}")
+
+def salvar_perfil(amostrador, status):
+    pasta = app.config['PROFILE_DIR']
+    os.makedirs(pasta, exist_ok=True)
+    perfil_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    with open(os.path.join(pasta, f"{perfil_id}.folded"), 'w', encoding='utf-8') as arquivo:
+        arquivo.write(amostrador.pilhas_colapsadas())
+    with open(os.path.join(pasta, f"{perfil_id}.json"), 'w', encoding='utf-8') as arquivo:
+        json.dump({
+            "id": perfil_id,
+            "rota": request.endpoint,
+            "metodo": request.method,
+            "caminho": request.full_path.rstrip('?'),
+            "status": status,
+            "inicio": amostrador.iniciado_em.isoformat(timespec='seconds'),
+            "duracao_ms": round(amostrador.duracao * 1000, 1),
+            "consultas": amostrador.consultas,
+            "tempo_consultas_ms": round(amostrador.tempo_consultas * 1000, 1),
+            "amostras": sum(amostrador.pilhas.values()),
+        }, arquivo)
+    # Mantém apenas os perfis mais recentes
+    metadados = sorted(nome for nome in os.listdir(pasta) if nome.endswith('.json') and nome != 'config.json')
+    for nome in metadados[:-app.config['PROFILE_MAX_FILES']]:
+        for extensao in ('.json', '.folded'):
+            caminho = os.path.join(pasta, nome[:-5] + extensao)
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+def listar_perfis():
+    pasta = app.config['PROFILE_DIR']
+    if not os.path.isdir(pasta):
+        return []
+    perfis = []
+    for nome in sorted(os.listdir(pasta), reverse=True):
+        if nome.endswith('.json') and nome != 'config.json':
+            try:
+                with open(os.path.join(pasta, nome), encoding='utf-8') as arquivo:
+                    perfis.append(json.load(arquivo))
+            except (OSError, ValueError):
+                continue
+    return perfis
+
+def resolver_disputas():
+    """Atribui cada vaga com período de disputa encerrado ao interessado com prioridade.
+
+    Só concorre quem ainda tem a habilidade da vaga e não está escalado em outra vaga no
+    mesmo dia e horário. A prioridade é de quem serviu menos nos últimos 30 dias (sem contar
+    escalas futuras); empates vão para quem demonstrou interesse primeiro. Sem interessados
+    elegíveis, a vaga volta a ficar aberta.
+    """
+    agora = datetime.now()
+    vencidas = db.session.query(Vaga.id, Vaga.habilidade_id, Missa.data, Missa.horario) \
+                         .join(Missa, Missa.id == Vaga.missa_id) \
+                         .filter(Vaga.disputa_ate != None, Vaga.disputa_ate <= agora).all()
+    if not vencidas:
+        return 0
+    hoje = date.today()
+    servicos_recentes = (
+        select(func.count(Vaga.id)).join(Missa, Missa.id == Vaga.missa_id)
+        .where(Vaga.usuario_id == InteresseVaga.usuario_id, Missa.data >= hoje - timedelta(days=30), Missa.data <= hoje)
+        .correlate(InteresseVaga).scalar_subquery()
+    )
+    resolvidas = 0
+    for vaga_id, habilidade_id, data, horario in vencidas:
+        # Entre o interesse e o fim do prazo o acólito pode ter perdido a habilidade ou pegado outra vaga no horário
+        ja_escalado = (
+            select(Vaga.id).join(Missa, Missa.id == Vaga.missa_id)
+            .where(Vaga.usuario_id == InteresseVaga.usuario_id, Missa.data == data, Missa.horario == horario)
+            .correlate(InteresseVaga).exists()
+        )
+        vencedor = db.session.query(InteresseVaga.usuario_id) \
+                             .join(Usuario, Usuario.id == InteresseVaga.usuario_id) \
+                             .filter(InteresseVaga.vaga_id == vaga_id, ~ja_escalado,
+                                     or_(Usuario.is_admin, Usuario.habilidades_mascara.op('&')(bit_habilidade(habilidade_id)) != 0)) \
+                             .order_by(servicos_recentes, InteresseVaga.criado_em, InteresseVaga.id).first()
+        # Escrita única e condicional: se outro worker já resolveu esta disputa, ou a vaga foi
+        # liberada de novo com um prazo ainda aberto, nada muda
+        resultado = db.session.execute(
+            update(Vaga).where(Vaga.id == vaga_id, Vaga.disputa_ate != None, Vaga.disputa_ate <= agora,
+                               Vaga.usuario_id.is_(None))
+            .values(usuario_id=vencedor[0] if vencedor else None, disputa_ate=None)
+        )
+        # A fila só é apagada junto com a disputa que esta chamada encerrou
+        if resultado.rowcount:
+            db.session.execute(delete(InteresseVaga).where(InteresseVaga.vaga_id == vaga_id))
+            resolvidas += 1
+    db.session.commit()
+    return resolvidas
+
+# Verificação de senha fora da thread da requisição, com concorrência limitada: uma rajada de logins
+# não ocupa todos os núcleos e as demais rotas continuam respondendo
+_pool_senhas = ThreadPoolExecutor(max_workers=max(app.config['LOGIN_HASH_WORKERS'], 1), thread_name_prefix='hash-senha')
+_vagas_pool_senhas = threading.BoundedSemaphore(app.config['LOGIN_HASH_WORKERS'] + app.config['LOGIN_HASH_QUEUE'])
+
+def _calcular_no_pool_senhas(funcao, *args, **kwargs):
+    """Resultado de funcao calculado no pool de senhas; None se a fila não liberar a tempo."""
+    if app.config['LOGIN_HASH_WORKERS'] <= 0:
+        return funcao(*args, **kwargs)
+    if not _vagas_pool_senhas.acquire(timeout=app.config['LOGIN_HASH_TIMEOUT']):
+        return None
+    try:
+        return _pool_senhas.submit(funcao, *args, **kwargs).result()
+    finally:
+        _vagas_pool_senhas.release()
+
+def verificar_senha(usuario, senha):
+    """True/False conforme a senha; None se a fila de verificações não liberar a tempo."""
+    return _calcular_no_pool_senhas(check_password_hash, usuario.senha_hash, senha)
+
+def refazer_hash_senha(usuario, senha):
+    """Grava o hash com a política atual, calculado no mesmo pool; com o pool ocupado, fica para o próximo login."""
+    novo_hash = _calcular_no_pool_senhas(generate_password_hash, senha, method=app.config['PASSWORD_HASH_METHOD'])
+    if novo_hash:
+        usuario.senha_hash = novo_hash
+        db.session.commit()
+
+# Tentativas de login erradas permitidas por email e por IP (IPs são compartilhados, por exemplo no Wi-Fi da igreja)
+LIMITE_LOGIN_EMAIL = (5, 1 / 60)
+LIMITE_LOGIN_IP = (30, 1 / 10)
+
+def carregar_linhas_escala():
+    """Uma linha por vaga (ou por missa sem vagas) das missas não arquivadas, em uma única consulta."""
+    linhas = db.session.execute(
+        select(Missa.id, Missa.data, Missa.horario, Vaga.id, Habilidade.funcao, Vaga.usuario_id, Usuario.nome)
+        .outerjoin(Vaga, Vaga.missa_id == Missa.id)
+        .outerjoin(Habilidade, Habilidade.id == Vaga.habilidade_id)
+        .outerjoin(Usuario, Usuario.id == Vaga.usuario_id)
+        .where(Missa.arquivada == False)
+        .order_by(Missa.data, Missa.horario, Missa.id, Vaga.id)
+    ).all()
+    # Tuplas simples podem ser compartilhadas entre threads sem depender da sessão
+    return [tuple(linha) for linha in linhas]
+
+COLUNAS_EXPORTACAO = ["Data", "Dia", "Horário", "Função", "Acólito", "Email", "Arquivada"]
+
+def linhas_exportacao(inicio, fim):
+    """Gera as linhas da escala entre as datas (inclusive as arquivadas), lendo o banco em lotes."""
+    dias_semana = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
+    consulta = (
+        select(Missa.data, Missa.horario, Habilidade.funcao, Usuario.nome, Usuario.email, Missa.arquivada)
+        .join(Vaga, Vaga.missa_id == Missa.id)
+        .join(Habilidade, Habilidade.id == Vaga.habilidade_id)
+        .outerjoin(Usuario, Usuario.id == Vaga.usuario_id)
+        .where(Missa.data >= inicio, Missa.data <= fim)
+        .order_by(Missa.data, Missa.horario, Vaga.id)
+        # yield_per usa cursor no servidor (PostgreSQL): a memória não cresce com o intervalo
+        .execution_options(yield_per=1000)
+    )
+    for data, horario, funcao, nome, email, arquivada in db.session.execute(consulta):
+        yield [data.strftime('%d/%m/%Y'), dias_semana[data.weekday()], horario.strftime('%H:%M'),
+               funcao, nome or "", email or "", "Sim" if arquivada else "Não"]
+
+def gerar_csv(linhas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=';')
+    # BOM para o Excel reconhecer os acentos; ';' é o separador padrão do Excel em português
+    buffer.write('\ufeff')
+    escritor.writerow(COLUNAS_EXPORTACAO)
+    for linha in linhas:
+        escritor.writerow(linha)
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def gerar_xlsx(linhas):
+    # Modo write_only grava as linhas direto no arquivo temporário, sem montar a planilha na memória
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet("Escala")
+    aba.append(COLUNAS_EXPORTACAO)
+    for linha in linhas:
+        aba.append(linha)
+    with tempfile.TemporaryFile() as arquivo:
+        planilha.save(arquivo)
+        arquivo.seek(0)
+        while bloco := arquivo.read(64 * 1024):
+            yield bloco
+
+# Vagas abertas por conjunto de habilidades: usuários com as mesmas habilidades compartilham a entrada
+_cache_vagas_abertas = {}
+
+@db.event.listens_for(db.session, 'after_commit')
+def invalidar_cache_vagas_abertas(session=None):
+    # Qualquer commit neste worker pode ter ocupado ou liberado vagas; os demais workers expiram pelo tempo
+    _cache_vagas_abertas.clear()
+
+def carregar_vagas_abertas(mascara):
+    """Vagas sem acólito de missas não arquivadas cujas habilidades estão na máscara (None = todas)."""
+    consulta = (
+        select(Missa.id, Missa.data, Missa.horario, Vaga.id, Habilidade.funcao)
+        .join(Vaga, Vaga.missa_id == Missa.id)
+        .join(Habilidade, Habilidade.id == Vaga.habilidade_id)
+        .where(Vaga.usuario_id.is_(None), Missa.arquivada == False)
+        .order_by(Missa.data, Missa.horario, Missa.id, Vaga.id)
+    )
+    if mascara is not None:
+        consulta = consulta.where(Vaga.habilidade_id.in_(habilidades_da_mascara(mascara)))
+    return [tuple(linha) for linha in db.session.execute(consulta).all()]
+
+def vagas_abertas_para(mascara):
+    chave = 'todas' if mascara is None else mascara
+    agora = datetime.now().timestamp()
+    entrada = _cache_vagas_abertas.get(chave)
+    if entrada is None or entrada[0] < agora:
+        linhas = consulta_coalescida(('vagas-abertas', chave), lambda: carregar_vagas_abertas(mascara))
+        entrada = _cache_vagas_abertas[chave] = (agora + app.config['VAGAS_ABERTAS_CACHE_SECONDS'], linhas)
+    return entrada[1]
+
+def resposta_condicional(resposta):
+    """Adiciona ETag e responde 304 sem corpo quando o cliente já tem esta versão."""
+    # ETag fraco porque o corpo pode sair comprimido de formas diferentes
+    resposta.add_etag(weak=True)
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta.make_conditional(request)
+
+def resposta_json_rapida(payload):
+    if orjson is not None:
+        return Response(orjson.dumps(payload), mimetype='application/json')
+    return Response(json.dumps(payload, ensure_ascii=False, separators=(',', ':')), mimetype='application/json')
+
+def resposta_escala_compacta(linhas, dias_semana):
+    """Escala em formato colunar: funções e acólitos viram tabelas e cada vaga uma tupla de inteiros.
+
+    Cada missa é [id, data, índice do dia, horário, vagas] e cada vaga é
+    [vaga_id, índice da função, índice do acólito (-1 se aberta), 1 se é do usuário logado].
+    """
+    funcoes, indice_funcoes = [], {}
+    acolitos, indice_acolitos = [], {}
+    lista_missas, missa_atual = [], None
+    meu_id = current_user.id
+    for missa_id, data, horario, vaga_id, funcao, usuario_id, nome_acolito in linhas:
+        if missa_atual is None or missa_atual[0] != missa_id:
+            missa_atual = [missa_id, data.isoformat(), data.weekday(), horario.strftime('%H:%M'), []]
+            lista_missas.append(missa_atual)
+        if vaga_id is None:
+            continue
+        indice_funcao = indice_funcoes.get(funcao)
+        if indice_funcao is None:
+            indice_funcao = indice_funcoes[funcao] = len(funcoes)
+            funcoes.append(funcao)
+        indice_acolito = -1
+        if usuario_id is not None:
+            indice_acolito = indice_acolitos.get(usuario_id)
+            if indice_acolito is None:
+                indice_acolito = indice_acolitos[usuario_id] = len(acolitos)
+                acolitos.append(nome_acolito)
+        missa_atual[4].append([vaga_id, indice_funcao, indice_acolito, 1 if usuario_id == meu_id else 0])
+    return resposta_json_rapida({
+        "status": "sucesso",
+        "format": "compact",
+        "days": dias_semana,
+        "roles": funcoes,
+        "acolytes": acolitos,
+        "missas": lista_missas,
+    })
+
 
 # --- 4. ROTA SECRETA PARA SETUP INICIAL ---
 @app.route('/setup-inicial/<secret_key>')
@@ -131,12 +794,38 @@ def setup_database(secret_key):
 def login():
     if current_user.is_authenticated: return redirect(url_for('index'))
     if request.method == 'POST':
-        user = Usuario.query.filter_by(email=request.form.get('email')).first()
-        if user and user.check_password(request.form.get('password')):
+        email, senha = request.form.get('email') or '', request.form.get('password') or ''
+        limites = [(f"login:email:{email.strip().lower()}", LIMITE_LOGIN_EMAIL),
+                   (f"login:ip:{request.remote_addr}", LIMITE_LOGIN_IP)]
+
+        # Cada tentativa retira um token de cada balde antes de calcular o hash, para tentativas
+        # paralelas não passarem todas pela checagem; o login certo (ou recusado por falta de vaga
+        # no pool) devolve os tokens, então só as senhas erradas contam
+        consumidos = []
+        if app.config['RATE_LIMIT_ENABLED']:
+            for chave, limite in limites:
+                if not consumir_token(chave, *limite)[0]:
+                    for chave_consumida, capacidade in consumidos:
+                        devolver_token(chave_consumida, capacidade)
+                    flash('Muitas tentativas de login. Aguarde alguns minutos e tente novamente.', 'danger')
+                    return render_template('login.html'), 429
+                consumidos.append((chave, limite[0]))
+
+        user = Usuario.query.filter_by(email=email).first()
+        senha_correta = verificar_senha(user, senha) if user else False
+        if senha_correta is not False:
+            for chave, capacidade in consumidos:
+                devolver_token(chave, capacidade)
+        if senha_correta is None:
+            flash('O servidor está ocupado. Tente entrar novamente em alguns segundos.', 'danger')
+            return render_template('login.html'), 503
+        if senha_correta:
+            # Atualiza o hash guardado quando a política de hash mudou
+            if user.precisa_rehash():
+                refazer_hash_senha(user, senha)
             login_user(user)
             return redirect(url_for('index'))
-        else:
-            flash('Email ou senha inválidos.', 'danger')
+        flash('Email ou senha inválidos.', 'danger')
     return render_template('login.html')
 
 @app.route('/logout')
@@ -145,6 +834,13 @@ def logout():
     logout_user()
     return redirect(url_for('login'))
 
+@app.route('/sw.js')
+def service_worker():
+    # Servido na raiz (e não em /static) para que o service worker controle todas as páginas
+    resposta = app.send_static_file('sw.js')
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta
+
 @app.route('/')
 @login_required
 def index():
@@ -167,8 +863,10 @@ def pedir_substituicao(vaga_id):
         flash('Você não tem permissão para liberar esta vaga.', 'danger')
         return redirect(url_for('minha_escala'))
 
-    # Libera a vaga no sistema
+    # Libera a vaga no sistema; com período de disputa, os interessados entram na fila até o prazo
     vaga.usuario_id = None
+    if app.config['CLAIM_WINDOW_SECONDS'] > 0:
+        vaga.disputa_ate = datetime.now() + timedelta(seconds=app.config['CLAIM_WINDOW_SECONDS'])
     db.session.commit()
     
     # Adiciona uma mensagem de sucesso
@@ -179,8 +877,12 @@ def pedir_substituicao(vaga_id):
 
 @app.route('/api/inscrever-vaga/<int:vaga_id>', methods=['POST'])
 @login_required
+@limite_requisicoes(capacidade=5, por_segundo=0.2)
 def inscrever_vaga(vaga_id):
     try:
+        if app.config['CLAIM_WINDOW_SECONDS'] > 0:
+            resolver_disputas()
+
         # 1. Encontrar a vaga pelo ID
         vaga = Vaga.query.get_or_404(vaga_id)
         
@@ -189,13 +891,20 @@ def inscrever_vaga(vaga_id):
             return jsonify({"status": "erro", "message": "Esta vaga já foi ocupada."}), 409
         
         # 3. Verificar se o acólito logado tem a habilidade necessária OU é um admin
-        funcao_desejada = vaga.funcao
-        acolito_pode_pegar_vaga = current_user.is_admin or any(habilidade.funcao == funcao_desejada for habilidade in current_user.habilidades)
-        
-        if not acolito_pode_pegar_vaga:
-            return jsonify({"status": "erro", "message": f"Você não tem a habilidade necessária ({funcao_desejada}) para se inscrever nesta vaga."}), 403
-
-        # 4. Atribuir a vaga ao usuário logado
+        if not current_user.pode_servir(vaga.habilidade_id):
+            return jsonify({"status": "erro", "message": f"Você não tem a habilidade necessária ({vaga.funcao}) para se inscrever nesta vaga."}), 403
+
+        # 4. Vaga em disputa: só registra o interesse (um INSERT barato); o vencedor é escolhido ao fim do prazo
+        if vaga.disputa_ate is not None:
+            try:
+                db.session.add(InteresseVaga(vaga_id=vaga.id, usuario_id=current_user.id))
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+            prazo = vaga.disputa_ate.strftime('%H:%M:%S')
+            return jsonify({"status": "sucesso", "disputa": True, "message": f"Interesse registrado! A vaga de {vaga.funcao} será atribuída às {prazo}, com prioridade para quem serviu menos recentemente."}), 202
+
+        # 5. Atribuir a vaga ao usuário logado
         vaga.usuario_id = current_user.id
         db.session.commit()
         
@@ -207,28 +916,77 @@ def inscrever_vaga(vaga_id):
 
 
 # --- 7. ROTAS DO PAINEL DO COORDENADOR (ADMIN) ---
+LIMITE_BUSCA_USUARIOS = 50
+
 @app.route('/admin')
 @login_required
 @admin_required
 def admin_panel():
-    usuarios = Usuario.query.order_by(Usuario.nome).all()
-    missas = Missa.query.filter_by(arquivada=False).order_by(Missa.data.desc(), Missa.horario).all()
+    # A tabela mostra só os primeiros acólitos; os demais são encontrados pela busca
+    usuarios = Usuario.query.order_by(Usuario.nome).limit(LIMITE_BUSCA_USUARIOS).all()
+    total_usuarios = Usuario.query.count()
+    missas = Missa.query.filter_by(arquivada=False).options(db.selectinload(Missa.vagas)).order_by(Missa.data.desc(), Missa.horario).all()
+    # Candidatos carregados uma única vez; a elegibilidade de cada vaga vira uma operação de bits
+    candidatos = db.session.query(Usuario.id, Usuario.nome, Usuario.is_admin, Usuario.habilidades_mascara).order_by(Usuario.nome).all()
     for missa in missas:
         for vaga in missa.vagas:
-            # Acólitos qualificados incluem todos os acólitos não-admin COM a habilidade
-            acolitos_qualificados_por_habilidade = Usuario.query.join(Usuario.habilidades).filter(Habilidade.funcao == vaga.funcao, Usuario.is_admin == False).order_by(Usuario.nome).all()
-            
-            # Admins também são incluídos para alocação manual
-            admins = Usuario.query.filter_by(is_admin=True).order_by(Usuario.nome).all()
-            
-            vaga.acolitos_qualificados = sorted(
-                list(set(acolitos_qualificados_por_habilidade + admins)), 
-                key=lambda u: u.nome
-            )
+            # Acólitos qualificados: não-admins COM a habilidade, mais os admins para alocação manual
+            bit = bit_habilidade(vaga.habilidade_id)
+            vaga.acolitos_qualificados = [c for c in candidatos if c.is_admin or c.habilidades_mascara & bit]
             
     dias_semana = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
     todas_habilidades = Habilidade.query.order_by(Habilidade.funcao).all()
-    return render_template('admin.html', usuarios=usuarios, missas=missas, dias_semana=dias_semana, todas_habilidades=todas_habilidades)
+    return render_template('admin.html', usuarios=usuarios, total_usuarios=total_usuarios, limite_busca=LIMITE_BUSCA_USUARIOS, missas=missas, dias_semana=dias_semana, todas_habilidades=todas_habilidades)
+
+@app.route('/admin/api/usuarios')
+@login_required
+@admin_required
+def buscar_usuarios():
+    termo = normalizar_busca(request.args.get('q', ''))
+    habilidade_id = request.args.get('habilidade_id', type=int)
+    consulta = db.session.query(Usuario.id, Usuario.nome, Usuario.email, Usuario.is_admin)
+    # Cada palavra digitada precisa ser prefixo de alguma palavra do nome ou do email ("alv" acha "José Álvares")
+    for palavra in termo.split():
+        if db.engine.dialect.name == 'postgresql':
+            # LIKE 'x%' usa o índice varchar_pattern_ops independente da collation do banco
+            prefixo = UsuarioTermo.termo.startswith(palavra, autoescape=True)
+        else:
+            prefixo = UsuarioTermo.termo.between(palavra, palavra + '\uffff')
+        consulta = consulta.filter(Usuario.id.in_(select(UsuarioTermo.usuario_id).where(prefixo)))
+    if habilidade_id:
+        consulta = consulta.join(usuario_habilidades, usuario_habilidades.c.usuario_id == Usuario.id) \
+                           .filter(usuario_habilidades.c.habilidade_id == habilidade_id)
+    usuarios = consulta.order_by(Usuario.nome_busca).limit(LIMITE_BUSCA_USUARIOS).all()
+    return jsonify({"status": "sucesso", "usuarios": [
+        {"id": u.id, "nome": u.nome, "email": u.email, "is_admin": u.is_admin} for u in usuarios
+    ]})
+
+@app.route('/admin/perfis', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def admin_perfis():
+    if request.method == 'POST':
+        try:
+            taxa = float(request.form.get('taxa', '0').replace(',', '.'))
+        except ValueError:
+            taxa = -1
+        if not 0 <= taxa <= 1:
+            flash("A taxa de amostragem deve estar entre 0 e 1.", "danger")
+        else:
+            os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+            with open(os.path.join(app.config['PROFILE_DIR'], 'config.json'), 'w', encoding='utf-8') as arquivo:
+                json.dump({"taxa": taxa}, arquivo)
+            _config_perfil['lida_em'] = 0.0
+            flash(f"Taxa de amostragem atualizada para {taxa:.2%}.", "success")
+        return redirect(url_for('admin_perfis'))
+    token = _serializador_perfil().dumps({"admin": current_user.id})
+    return render_template('admin_perfis.html', perfis=listar_perfis(), taxa=taxa_amostragem_perfil(), token=token)
+
+@app.route('/admin/perfis/<perfil_id>.folded')
+@login_required
+@admin_required
+def baixar_perfil(perfil_id):
+    return send_from_directory(app.config['PROFILE_DIR'], f"{perfil_id}.folded", as_attachment=True, mimetype='text/plain')
 
 # Nova rota para excluir usuário
 @app.route('/admin/delete_user/<int:user_id>', methods=['POST'])
@@ -250,6 +1008,7 @@ def delete_user(user_id):
     try:
         # Primeiro, desaloque o acólito de todas as vagas para evitar erros
         Vaga.query.filter_by(usuario_id=user_id).update({"usuario_id": None})
+        InteresseVaga.query.filter_by(usuario_id=user_id).delete()
         db.session.commit()
         
         # Em seguida, exclua o usuário
@@ -278,6 +1037,7 @@ def edit_usuario(user_id):
             habilidade = Habilidade.query.get(hab_id)
             if habilidade:
                 usuario.habilidades.append(habilidade)
+        usuario.atualizar_mascara_habilidades()
         db.session.commit()
         flash(f"Habilidades de {usuario.nome} atualizadas com sucesso!", "success")
         return redirect(url_for('admin_panel'))
@@ -305,7 +1065,10 @@ def add_user():
 def assign_vaga(vaga_id):
     vaga, usuario_id = Vaga.query.get_or_404(vaga_id), request.form.get('usuario_id')
     if usuario_id:
+        # A alocação pelo coordenador encerra qualquer disputa pela vaga
         vaga.usuario_id = int(usuario_id)
+        vaga.disputa_ate = None
+        vaga.interesses.clear()
         db.session.commit()
         flash("Acólito alocado com sucesso.", "success")
     else:
@@ -327,12 +1090,12 @@ def unassign_vaga(vaga_id):
 @admin_required
 def add_missa():
     try:
-        data_str, horario_str, funcoes = request.form.get('data'), request.form.get('horario'), request.form.getlist('funcao')
+        data_str, horario_str, habilidades_ids = request.form.get('data'), request.form.get('horario'), request.form.getlist('habilidade_id')
         data_obj, horario_obj = datetime.strptime(data_str, '%Y-%m-%d').date(), datetime.strptime(horario_str, '%H:%M').time()
         nova_missa = Missa(data=data_obj, horario=horario_obj)
-        for nome_funcao in funcoes:
-            if nome_funcao.strip():
-                nova_vaga = Vaga(funcao=nome_funcao.strip(), missa=nova_missa)
+        for habilidade_id in habilidades_ids:
+            if habilidade_id:
+                nova_vaga = Vaga(habilidade_id=int(habilidade_id), missa=nova_missa)
                 db.session.add(nova_vaga)
         db.session.add(nova_missa)
         db.session.commit()
@@ -408,6 +1171,7 @@ def gerar_escala_padrao():
                 {'horario': time(19, 0), 'funcoes': ["Cerimoniário Mor (CM)", "Cerimoniário da Palavra (CP)"]}] # Domingo
         }
 
+        habilidades_por_funcao = {h.funcao: h for h in Habilidade.query.all()}
         missas_criadas = 0
         for i in range(7):
             dia = start_date + timedelta(days=i)
@@ -420,7 +1184,11 @@ def gerar_escala_padrao():
                         db.session.flush()
 
                         for funcao_nome in agendamento['funcoes']:
-                            nova_vaga = Vaga(funcao=funcao_nome, missa_id=nova_missa.id)
+                            habilidade = habilidades_por_funcao.get(funcao_nome)
+                            if habilidade is None:
+                                habilidade = habilidades_por_funcao[funcao_nome] = Habilidade(funcao=funcao_nome)
+                                db.session.add(habilidade)
+                            nova_vaga = Vaga(habilidade=habilidade, missa_id=nova_missa.id)
                             db.session.add(nova_vaga)
                         missas_criadas += 1
 
@@ -450,11 +1218,12 @@ def gerar_ata():
             Missa.data >= start_date,
             Missa.data <= end_date,
             Missa.arquivada == False
-        ).order_by(Missa.data, Missa.horario).all()
+        ).options(db.selectinload(Missa.vagas).joinedload(Vaga.usuario)).order_by(Missa.data, Missa.horario).all()
         
         dias_semana_full = ["Segunda-Feira", "Terça-Feira", "Quarta-Feira", "Quinta-Feira", "Sexta-Feira", "Sábado", "Domingo"]
         
-        funcoes_na_semana = sorted(list(set(vaga.funcao for missa in missas for vaga in missa.vagas)))
+        habilidades_na_semana = sorted({vaga.habilidade for missa in missas for vaga in missa.vagas}, key=lambda h: h.funcao)
+        funcoes_na_semana = [habilidade.funcao for habilidade in habilidades_na_semana]
         
         dados_tabela_escala = [["Dia", "Horário"] + funcoes_na_semana]
         
@@ -475,8 +1244,12 @@ def gerar_ata():
                     linha.append(dia_semana_nome if index == 0 else "")
                     linha.append(missa.horario.strftime('%H:%M'))
                     
-                    for funcao in funcoes_na_semana:
-                        vaga_encontrada = next((v for v in missa.vagas if v.funcao == funcao), None)
+                    # Primeira vaga de cada habilidade nesta missa
+                    vagas_por_habilidade = {}
+                    for v in missa.vagas:
+                        vagas_por_habilidade.setdefault(v.habilidade_id, v)
+                    for habilidade in habilidades_na_semana:
+                        vaga_encontrada = vagas_por_habilidade.get(habilidade.id)
                         nome_acolito = vaga_encontrada.usuario.nome if vaga_encontrada and vaga_encontrada.usuario else ""
                         linha.append(nome_acolito)
                     dados_tabela_escala.append(linha)
@@ -550,29 +1323,94 @@ def gerar_ata():
         return redirect(url_for('admin_panel'))
 
 
+@app.route('/admin/exportar-escala')
+@login_required
+@admin_required
+def exportar_escala():
+    formato = request.args.get('formato', 'csv')
+    try:
+        hoje = date.today()
+        inicio = datetime.strptime(request.args['inicio'], '%Y-%m-%d').date() if request.args.get('inicio') else date(hoje.year, 1, 1)
+        fim = datetime.strptime(request.args['fim'], '%Y-%m-%d').date() if request.args.get('fim') else hoje
+    except ValueError:
+        flash("Datas inválidas para a exportação.", "danger")
+        return redirect(url_for('admin_panel'))
+    if formato == 'xlsx' and Workbook is None:
+        flash("Exportação em XLSX indisponível: instale o pacote openpyxl.", "danger")
+        return redirect(url_for('admin_panel'))
+
+    nome_arquivo = f"escala_{inicio.isoformat()}_{fim.isoformat()}.{'xlsx' if formato == 'xlsx' else 'csv'}"
+    if formato == 'xlsx':
+        gerador, mimetype = gerar_xlsx(linhas_exportacao(inicio, fim)), 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        gerador, mimetype = gerar_csv(linhas_exportacao(inicio, fim)), 'text/csv; charset=utf-8'
+    return Response(stream_with_context(gerador), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{nome_arquivo}"'})
+
+
 # --- 8. ROTA DA API ---
 @app.route('/api/missas')
 @login_required
+@limite_requisicoes(capacidade=20, por_segundo=1)
 def get_missas():
-    missas_db = Missa.query.filter_by(arquivada=False).order_by(Missa.data, Missa.horario).all()
+    if app.config['CLAIM_WINDOW_SECONDS'] > 0:
+        resolver_disputas()
+    linhas = consulta_coalescida('escala', carregar_linhas_escala)
     lista_missas, dias_semana = [], ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
-    for missa in missas_db:
-        slots = []
-        for vaga in missa.vagas:
-            slots.append({
-                "role": vaga.funcao, 
-                "acolyte": vaga.usuario.nome if vaga.usuario else None,
-                "vaga_id": vaga.id,
-                "is_mine": (current_user.is_authenticated and vaga.usuario_id == current_user.id)
+    if request.args.get('format') == 'compact':
+        return resposta_condicional(resposta_escala_compacta(linhas, dias_semana))
+    missa_atual = None
+    for missa_id, data, horario, vaga_id, funcao, usuario_id, nome_acolito in linhas:
+        if missa_atual is None or missa_atual["id"] != missa_id:
+            missa_atual = {
+                "id": missa_id, 
+                "date": data.isoformat(), 
+                "day": dias_semana[data.weekday()], 
+                "time": horario.strftime('%H:%M'), 
+                "slots": []
+            }
+            lista_missas.append(missa_atual)
+        if vaga_id is not None:
+            missa_atual["slots"].append({
+                "role": funcao, 
+                "acolyte": nome_acolito,
+                "vaga_id": vaga_id,
+                "is_mine": (current_user.is_authenticated and usuario_id == current_user.id)
             })
-        lista_missas.append({
-            "id": missa.id, 
-            "date": missa.data.isoformat(), 
-            "day": dias_semana[missa.data.weekday()], 
-            "time": missa.horario.strftime('%H:%M'), 
-            "slots": slots
-        })
-    return jsonify({"status": "sucesso", "missas": lista_missas})
+    return resposta_condicional(jsonify({"status": "sucesso", "missas": lista_missas}))
+
+@app.route('/api/vagas-abertas')
+@login_required
+@limite_requisicoes(capacidade=20, por_segundo=1)
+def get_vagas_abertas():
+    # Admins podem pegar qualquer vaga; os demais só as das suas habilidades
+    if app.config['CLAIM_WINDOW_SECONDS'] > 0:
+        resolver_disputas()
+    mascara = None if current_user.is_admin else current_user.habilidades_mascara
+    linhas = vagas_abertas_para(mascara) if mascara != 0 else []
+
+    # Remove horários em que o usuário já está escalado
+    ocupados = set(db.session.execute(
+        select(Missa.data, Missa.horario).join(Vaga, Vaga.missa_id == Missa.id)
+        .where(Vaga.usuario_id == current_user.id, Missa.arquivada == False)
+    ).all())
+
+    lista_missas, dias_semana = [], ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
+    missa_atual = None
+    for missa_id, data, horario, vaga_id, funcao in linhas:
+        if (data, horario) in ocupados:
+            continue
+        if missa_atual is None or missa_atual["id"] != missa_id:
+            missa_atual = {
+                "id": missa_id,
+                "date": data.isoformat(),
+                "day": dias_semana[data.weekday()],
+                "time": horario.strftime('%H:%M'),
+                "slots": []
+            }
+            lista_missas.append(missa_atual)
+        missa_atual["slots"].append({"role": funcao, "acolyte": None, "vaga_id": vaga_id, "is_mine": False})
+    return resposta_condicional(jsonify({"status": "sucesso", "missas": lista_missas}))
 
 
 # --- 9. COMANDOS DE TERMINAL ---
@@ -602,6 +1440,58 @@ def seed_habilidades():
     db.session.commit()
     print("Tabela de habilidades populada com sucesso!")
 
+@app.cli.command("exportar-escala")
+@click.option('--inicio', required=True, help="Data inicial (AAAA-MM-DD).")
+@click.option('--fim', required=True, help="Data final (AAAA-MM-DD).")
+@click.option('--formato', type=click.Choice(['csv', 'xlsx']), default='csv')
+@click.option('--saida', required=True, help="Arquivo de destino.")
+def exportar_escala_cli(inicio, fim, formato, saida):
+    """Exporta a escala (inclusive missas arquivadas) entre duas datas em CSV ou XLSX."""
+    inicio = datetime.strptime(inicio, '%Y-%m-%d').date()
+    fim = datetime.strptime(fim, '%Y-%m-%d').date()
+    if formato == 'xlsx' and Workbook is None:
+        print("Exportação em XLSX indisponível: instale o pacote openpyxl.")
+        return
+    gerador = gerar_xlsx(linhas_exportacao(inicio, fim)) if formato == 'xlsx' else gerar_csv(linhas_exportacao(inicio, fim))
+    with open(saida, 'wb') as arquivo:
+        for bloco in gerador:
+            arquivo.write(bloco if isinstance(bloco, bytes) else bloco.encode('utf-8'))
+    print(f"Escala de {inicio.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')} exportada para '{saida}'.")
+
+@app.cli.command("resolver-disputas")
+def resolver_disputas_cli():
+    """Atribui as vagas cujo período de disputa já terminou."""
+    print(f"{resolver_disputas()} disputas de vagas resolvidas.")
+
+@app.cli.command("build-assets")
+def build_assets():
+    """Gera cópias com hash no nome (e versões gzip/brotli) dos arquivos estáticos."""
+    global _manifesto_assets
+    destino = app.config['STATIC_DIST_FOLDER']
+    os.makedirs(destino, exist_ok=True)
+    manifesto = {}
+    for nome in ASSETS_ESTATICOS:
+        with open(os.path.join(app.static_folder, nome), 'rb') as arquivo:
+            conteudo = arquivo.read()
+        base, extensao = os.path.splitext(nome)
+        nome_com_hash = f"{base}.{hashlib.sha256(conteudo).hexdigest()[:12]}{extensao}"
+        caminho = os.path.join(destino, nome_com_hash)
+        with open(caminho, 'wb') as arquivo:
+            arquivo.write(conteudo)
+        with open(caminho + '.gz', 'wb') as arquivo:
+            arquivo.write(gzip.compress(conteudo, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(caminho + '.br', 'wb') as arquivo:
+                arquivo.write(brotli.compress(conteudo, quality=11))
+        manifesto[nome] = nome_com_hash
+        print(f"{nome} -> dist/{nome_com_hash}")
+    with open(os.path.join(destino, 'manifest.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump(manifesto, arquivo, indent=2)
+    _manifesto_assets = manifesto
+    if brotli is None:
+        print("Aviso: pacote 'brotli' não instalado, apenas versões gzip foram geradas.")
+    print("Assets gerados com sucesso!")
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,147 @@
+# bench_login.py
+"""Mede a latência de /api/missas e os logins concluídos por segundo durante uma rajada de logins.
+
+Uso: python bench_login.py [logins_simultaneos] [segundos] [--gunicorn]
+
+Sem --gunicorn, compara três cenários no mesmo processo: sem logins, logins com o hash
+calculado na própria requisição (LOGIN_HASH_WORKERS=0) e logins com o pool limitado.
+
+Com --gunicorn, sobe um gunicorn de verdade para cada cenário e mede por HTTP: o worker
+"sync" padrão (um login ocupa o worker inteiro) contra o gunicorn.conf.py do projeto (gthread).
+"""
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+from datetime import date, timedelta, time as hora
+
+# Banco temporário próprio, configurado antes de importar o app
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+os.environ['RATE_LIMIT_ENABLED'] = '0'
+
+from app import app, db, Usuario, Missa, Vaga, Habilidade
+
+ARGUMENTOS = [argumento for argumento in sys.argv[1:] if not argumento.startswith('--')]
+LOGINS_SIMULTANEOS = int(ARGUMENTOS[0]) if len(ARGUMENTOS) > 0 else 16
+SEGUNDOS = float(ARGUMENTOS[1]) if len(ARGUMENTOS) > 1 else 5
+MODO_GUNICORN = '--gunicorn' in sys.argv
+DADOS_LOGIN = {'email': 'bench@teste.com', 'password': 'senha-bench'}
+
+
+def preparar_banco():
+    with app.app_context():
+        db.create_all()
+        habilidade = Habilidade(funcao="Cerimoniário Mor (CM)")
+        usuario = Usuario(nome="Acólito Teste", email="bench@teste.com")
+        usuario.set_password("senha-bench")
+        usuario.habilidades.append(habilidade)
+        db.session.add_all([habilidade, usuario])
+        for i in range(60):
+            missa = Missa(data=date.today() + timedelta(days=i), horario=hora(19, 0))
+            db.session.add(missa)
+            db.session.add(Vaga(habilidade=habilidade, missa=missa))
+        db.session.commit()
+
+
+def medir(nome, logins_simultaneos, fazer_login, consultar_escala):
+    """Roda `fazer_login` em laço em várias threads enquanto mede `consultar_escala` na thread principal."""
+    parar = threading.Event()
+    respostas_login = {}
+    lock = threading.Lock()
+
+    def tempestade_de_logins():
+        while not parar.is_set():
+            status = fazer_login()
+            with lock:
+                respostas_login[status] = respostas_login.get(status, 0) + 1
+
+    threads = [threading.Thread(target=tempestade_de_logins, daemon=True) for _ in range(logins_simultaneos)]
+    inicio_cenario = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    latencias = []
+    fim = time.perf_counter() + SEGUNDOS
+    while time.perf_counter() < fim:
+        inicio = time.perf_counter()
+        consultar_escala()
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+    parar.set()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio_cenario
+
+    latencias.sort()
+    p50 = latencias[len(latencias) // 2]
+    p95 = latencias[int(len(latencias) * 0.95)]
+    # Login concluído = redirecionamento para a página inicial (302); 429/503 são recusas
+    logins_por_segundo = respostas_login.get(302, 0) / duracao
+    print(f"{nome:<36} p50={p50:7.1f} ms  p95={p95:7.1f} ms  requisições={len(latencias):5d}  "
+          f"logins/s={logins_por_segundo:6.1f}  respostas={respostas_login}")
+
+
+def rodar_cenario(nome, logins_simultaneos, hash_workers):
+    app.config['LOGIN_HASH_WORKERS'] = hash_workers
+    cliente = app.test_client()
+    cliente.post('/login', data=DADOS_LOGIN)
+    medir(nome, logins_simultaneos,
+          lambda: app.test_client().post('/login', data=DADOS_LOGIN).status_code,
+          lambda: cliente.get('/api/missas'))
+
+
+def requisicao_http(porta, metodo, caminho, dados=None, cookie=None):
+    conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=60)
+    cabecalhos = {'Cookie': cookie} if cookie else {}
+    if dados is not None:
+        cabecalhos['Content-Type'] = 'application/x-www-form-urlencoded'
+    conexao.request(metodo, caminho, body=urlencode(dados) if dados is not None else None, headers=cabecalhos)
+    resposta = conexao.getresponse()
+    resposta.read()
+    conexao.close()
+    return resposta
+
+
+def rodar_cenario_gunicorn(nome, logins_simultaneos, *opcoes_gunicorn):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        porta = sock.getsockname()[1]
+    # O gunicorn herda o DATABASE_URL do banco temporário e lê o gunicorn.conf.py da raiz do projeto
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{porta}', *opcoes_gunicorn, 'app:app'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            try:
+                login = requisicao_http(porta, 'POST', '/login', DADOS_LOGIN)
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError("O gunicorn não respondeu.")
+        cookie = login.getheader('Set-Cookie').split(';', 1)[0]
+        medir(nome, logins_simultaneos,
+              lambda: requisicao_http(porta, 'POST', '/login', DADOS_LOGIN).status,
+              lambda: requisicao_http(porta, 'GET', '/api/missas', cookie=cookie))
+    finally:
+        processo.terminate()
+        processo.wait()
+
+
+if __name__ == '__main__':
+    preparar_banco()
+    hash_workers = max(app.config['LOGIN_HASH_WORKERS'], 1)
+    print(f"Rajada de {LOGINS_SIMULTANEOS} logins simultâneos, {SEGUNDOS:.0f}s por cenário, {os.cpu_count()} CPUs\n")
+    if MODO_GUNICORN:
+        rodar_cenario_gunicorn("gunicorn.conf.py, sem logins", 0)
+        rodar_cenario_gunicorn("Worker sync padrão", LOGINS_SIMULTANEOS, '--worker-class', 'sync')
+        rodar_cenario_gunicorn("gunicorn.conf.py (gthread)", LOGINS_SIMULTANEOS)
+    else:
+        rodar_cenario("Sem logins", 0, hash_workers)
+        rodar_cenario("Hash na própria requisição", LOGINS_SIMULTANEOS, 0)
+        rodar_cenario(f"Hash no pool ({hash_workers} threads)", LOGINS_SIMULTANEOS, hash_workers)
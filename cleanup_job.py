@@ -1,6 +1,6 @@
 # cleanup_job.py
-from app import app, db, Missa # Importe do seu app principal
-from datetime import date, timedelta
+from app import app, db, Missa, LimiteRequisicao, resolver_disputas # Importe do seu app principal
+from datetime import date, datetime, timedelta
 
 def run_cleanup():
     """Encontra e arquiva missas antigas."""
@@ -19,6 +19,15 @@ def run_cleanup():
         else:
             print("Nenhuma missa antiga para arquivar.")
 
+        # Baldes de limite de requisição parados há mais de um dia já estariam cheios de novo
+        limite = (datetime.now() - timedelta(days=1)).timestamp()
+        baldes_removidos = LimiteRequisicao.query.filter(LimiteRequisicao.atualizado_em < limite).delete()
+        db.session.commit()
+        print(f"Removidos {baldes_removidos} baldes de limite de requisição inativos.")
+
+        # Disputas cujo prazo venceu sem nenhuma requisição para resolvê-las
+        print(f"Resolvidas {resolver_disputas()} disputas de vagas pendentes.")
+
 if __name__ == '__main__':
     print("Iniciando tarefa de limpeza...")
     run_cleanup()
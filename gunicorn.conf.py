@@ -0,0 +1,10 @@
+# gunicorn.conf.py - lido automaticamente pelo gunicorn iniciado na raiz do projeto (ex.: `gunicorn app:app`)
+import os
+
+# Workers com threads: enquanto uma requisição de login espera o hash no pool de senhas
+# (LOGIN_HASH_WORKERS), as outras threads do mesmo worker continuam atendendo as demais rotas.
+# Com o worker "sync" padrão cada login ocupa o worker inteiro e o limite do pool nunca se aplica.
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+# Cada thread usa no máximo uma conexão do banco; fica abaixo do pool padrão do SQLAlchemy (5 + 10)
+threads = int(os.environ.get('GUNICORN_THREADS', '8'))
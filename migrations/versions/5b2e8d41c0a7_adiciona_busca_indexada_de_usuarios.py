@@ -0,0 +1,58 @@
+"""Adiciona busca indexada de usuarios
+
+Revision ID: 5b2e8d41c0a7
+Revises: a1f3c9e27b40
+Create Date: 2026-10-19 11:03:27.540916
+
+"""
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2e8d41c0a7'
+down_revision = 'a1f3c9e27b40'
+branch_labels = None
+depends_on = None
+
+
+def normalizar_busca(texto):
+    # Cópia da função do app.py, para a migração não depender do código atual
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).casefold().strip()
+
+
+def upgrade():
+    with op.batch_alter_table('usuario', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('nome_busca', sa.String(length=100), nullable=True))
+
+    # Preenche o nome normalizado dos usuários existentes
+    conn = op.get_bind()
+    usuario = sa.table('usuario', sa.column('id', sa.Integer), sa.column('nome', sa.String), sa.column('nome_busca', sa.String))
+    for id_usuario, nome in conn.execute(sa.select(usuario.c.id, usuario.c.nome)).all():
+        conn.execute(usuario.update().where(usuario.c.id == id_usuario).values(nome_busca=normalizar_busca(nome)))
+
+    with op.batch_alter_table('usuario', schema=None) as batch_op:
+        batch_op.alter_column('nome_busca', existing_type=sa.String(length=100), nullable=False)
+        batch_op.create_index(batch_op.f('ix_usuario_nome_busca'), ['nome_busca'], unique=False)
+
+    op.create_index('ix_usuario_habilidades_habilidade_id', 'usuario_habilidades', ['habilidade_id'], unique=False)
+
+    if conn.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute('CREATE INDEX ix_usuario_nome_busca_trgm ON usuario USING gin (nome_busca gin_trgm_ops)')
+        op.execute('CREATE INDEX ix_usuario_email_trgm ON usuario USING gin (lower(email) gin_trgm_ops)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_usuario_email_trgm')
+        op.execute('DROP INDEX IF EXISTS ix_usuario_nome_busca_trgm')
+
+    op.drop_index('ix_usuario_habilidades_habilidade_id', table_name='usuario_habilidades')
+
+    with op.batch_alter_table('usuario', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_usuario_nome_busca'))
+        batch_op.drop_column('nome_busca')
@@ -0,0 +1,60 @@
+"""Adiciona termos de busca de usuarios
+
+Revision ID: d8f2c7a41e96
+Revises: b3a61e5d8c29
+Create Date: 2026-10-19 19:42:37.115204
+
+"""
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f2c7a41e96'
+down_revision = 'b3a61e5d8c29'
+branch_labels = None
+depends_on = None
+
+
+def normalizar_busca(texto):
+    # Cópia da função do app.py, para a migração não depender do código atual
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).casefold().strip()
+
+
+def upgrade():
+    op.create_table('usuario_termo',
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('termo', sa.String(length=100), nullable=False),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuario.id'], ),
+    sa.PrimaryKeyConstraint('usuario_id', 'termo')
+    )
+    op.create_index('ix_usuario_termo_termo', 'usuario_termo', ['termo'], unique=False,
+                    postgresql_ops={'termo': 'varchar_pattern_ops'})
+
+    # Preenche os termos (palavras do nome e o email) dos usuários existentes
+    conn = op.get_bind()
+    usuario = sa.table('usuario', sa.column('id', sa.Integer), sa.column('nome', sa.String), sa.column('email', sa.String))
+    usuario_termo = sa.table('usuario_termo', sa.column('usuario_id', sa.Integer), sa.column('termo', sa.String))
+    linhas = []
+    for id_usuario, nome, email in conn.execute(sa.select(usuario.c.id, usuario.c.nome, usuario.c.email)).all():
+        termos = set(normalizar_busca(nome).split()) | {normalizar_busca(email)}
+        linhas.extend({'usuario_id': id_usuario, 'termo': t} for t in termos)
+    if linhas:
+        conn.execute(usuario_termo.insert(), linhas)
+
+    # A busca por substring com pg_trgm foi substituída pelos termos
+    if conn.dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_usuario_email_trgm')
+        op.execute('DROP INDEX IF EXISTS ix_usuario_nome_busca_trgm')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE INDEX ix_usuario_nome_busca_trgm ON usuario USING gin (nome_busca gin_trgm_ops)')
+        op.execute('CREATE INDEX ix_usuario_email_trgm ON usuario USING gin (lower(email) gin_trgm_ops)')
+
+    op.drop_index('ix_usuario_termo_termo', table_name='usuario_termo')
+    op.drop_table('usuario_termo')
@@ -0,0 +1,77 @@
+"""Normaliza funcao da vaga para habilidade e adiciona mascara de habilidades
+
+Revision ID: e4d7a0b93f15
+Revises: 5b2e8d41c0a7
+Create Date: 2026-10-19 13:47:05.902331
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4d7a0b93f15'
+down_revision = '5b2e8d41c0a7'
+branch_labels = None
+depends_on = None
+
+
+habilidade = sa.table('habilidade', sa.column('id', sa.Integer), sa.column('funcao', sa.String))
+vaga = sa.table('vaga', sa.column('id', sa.Integer), sa.column('funcao', sa.String), sa.column('habilidade_id', sa.Integer))
+usuario = sa.table('usuario', sa.column('id', sa.Integer), sa.column('habilidades_mascara', sa.BigInteger))
+usuario_habilidades = sa.table('usuario_habilidades', sa.column('usuario_id', sa.Integer), sa.column('habilidade_id', sa.Integer))
+
+
+def upgrade():
+    with op.batch_alter_table('vaga', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('habilidade_id', sa.Integer(), nullable=True))
+    with op.batch_alter_table('usuario', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('habilidades_mascara', sa.BigInteger(), nullable=False, server_default='0'))
+
+    conn = op.get_bind()
+
+    # Liga cada texto de vaga a uma habilidade. Diferenças só de espaços ou maiúsculas
+    # usam a habilidade existente; textos sem correspondência viram habilidades novas.
+    habilidades = {funcao.strip().casefold(): id_habilidade
+                   for id_habilidade, funcao in conn.execute(sa.select(habilidade.c.id, habilidade.c.funcao))}
+    for (funcao,) in conn.execute(sa.select(vaga.c.funcao).distinct()).all():
+        chave = funcao.strip().casefold()
+        if chave not in habilidades:
+            conn.execute(habilidade.insert().values(funcao=funcao.strip()))
+            habilidades[chave] = conn.execute(sa.select(habilidade.c.id).where(habilidade.c.funcao == funcao.strip())).scalar_one()
+        conn.execute(vaga.update().where(vaga.c.funcao == funcao).values(habilidade_id=habilidades[chave]))
+
+    # Máscara de bits das habilidades de cada usuário (bit = id da habilidade - 1).
+    # Um BIGINT com sinal só comporta ids de 1 a 63, então a migração para antes de gravar algo errado.
+    maior_id = conn.execute(sa.select(sa.func.max(habilidade.c.id))).scalar()
+    if maior_id is not None and maior_id > 63:
+        raise RuntimeError(f"A habilidade {maior_id} não cabe na máscara de bits (ids de 1 a 63); renumere as habilidades antes de migrar.")
+    mascaras = {}
+    for id_usuario, id_habilidade in conn.execute(sa.select(usuario_habilidades.c.usuario_id, usuario_habilidades.c.habilidade_id)):
+        mascaras[id_usuario] = mascaras.get(id_usuario, 0) | (1 << (id_habilidade - 1))
+    for id_usuario, mascara in mascaras.items():
+        conn.execute(usuario.update().where(usuario.c.id == id_usuario).values(habilidades_mascara=mascara))
+
+    with op.batch_alter_table('vaga', schema=None) as batch_op:
+        batch_op.alter_column('habilidade_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_index(batch_op.f('ix_vaga_habilidade_id'), ['habilidade_id'], unique=False)
+        batch_op.create_foreign_key('fk_vaga_habilidade_id_habilidade', 'habilidade', ['habilidade_id'], ['id'])
+        batch_op.drop_column('funcao')
+
+
+def downgrade():
+    with op.batch_alter_table('vaga', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('funcao', sa.String(length=100), nullable=True))
+
+    conn = op.get_bind()
+    for id_habilidade, funcao in conn.execute(sa.select(habilidade.c.id, habilidade.c.funcao)).all():
+        conn.execute(vaga.update().where(vaga.c.habilidade_id == id_habilidade).values(funcao=funcao))
+
+    with op.batch_alter_table('vaga', schema=None) as batch_op:
+        batch_op.alter_column('funcao', existing_type=sa.String(length=100), nullable=False)
+        batch_op.drop_constraint('fk_vaga_habilidade_id_habilidade', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_vaga_habilidade_id'))
+        batch_op.drop_column('habilidade_id')
+
+    with op.batch_alter_table('usuario', schema=None) as batch_op:
+        batch_op.drop_column('habilidades_mascara')
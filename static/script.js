@@ -3,6 +3,12 @@
 document.addEventListener('DOMContentLoaded', () => {
     const scheduleContainer = document.getElementById('schedule-container');
     const flashContainer = document.getElementById('flash-container');
+    const onlyOpportunitiesToggle = document.getElementById('only-opportunities');
+
+    // Mesmo nome de cache usado em static/sw.js para guardar a última escala recebida
+    const DATA_CACHE = 'escala-dados-v1';
+    let currentSchedule = [];
+    let hasFreshData = false;
 
     // Função para mostrar mensagens (como o flash do Flask) na tela
     function showFlashMessage(message, category = 'success') {
@@ -27,27 +33,131 @@ document.addEventListener('DOMContentLoaded', () => {
         }, 5000);
     }
 
+    // Agrupa recargas seguidas (vários cliques em sequência) em uma única chamada à API.
+    // Usada depois de pegar/liberar vaga, então sempre busca de novo em vez de reaproveitar uma requisição antiga
+    let reloadTimer = null;
+    function scheduleReload(delay = 300) {
+        clearTimeout(reloadTimer);
+        reloadTimer = setTimeout(() => loadScheduleFromAPI({ fresh: true }), delay);
+    }
+
     // Função para carregar os dados da escala via API
-    async function loadScheduleFromAPI() {
+    let loading = null;
+    function loadScheduleFromAPI({ fresh = false } = {}) {
+        const url = scheduleUrl();
+        // Se já existe uma requisição em andamento para a mesma URL, reaproveita em vez de disparar outra igual;
+        // se o filtro mudou (ou a escala mudou depois que ela começou), cancela a antiga para a resposta
+        // dela não sobrescrever a escala nova
+        if (loading && loading.url === url && !fresh) return loading.promise;
+        cancelScheduleLoad();
+        const current = { url, controller: new AbortController() };
+        current.promise = fetchSchedule(url, current.controller.signal)
+            .finally(() => { if (loading === current) loading = null; });
+        loading = current;
+        return current.promise;
+    }
+
+    function cancelScheduleLoad() {
+        if (loading) loading.controller.abort();
+        loading = null;
+    }
+
+    // Converte o formato compacto da API (tabelas de funções/acólitos + tuplas) no formato usado na renderização
+    function decodeCompactSchedule(data) {
+        return data.missas.map(([id, date, dayIndex, time, slots]) => ({
+            id,
+            date,
+            day: data.days[dayIndex],
+            time,
+            slots: slots.map(([vagaId, roleIndex, acolyteIndex, isMine]) => ({
+                role: data.roles[roleIndex],
+                acolyte: acolyteIndex >= 0 ? data.acolytes[acolyteIndex] : null,
+                vaga_id: vagaId,
+                is_mine: isMine === 1,
+            })),
+        }));
+    }
+
+    // "Só minhas oportunidades" mostra apenas as vagas abertas que o usuário pode pegar
+    function isOnlyOpportunities() {
+        return Boolean(onlyOpportunitiesToggle && onlyOpportunitiesToggle.checked);
+    }
+
+    function scheduleUrl() {
+        return isOnlyOpportunities() ? '/api/vagas-abertas' : '/api/missas?format=compact';
+    }
+
+    function parseSchedule(data) {
+        if (data.status !== 'sucesso') return [];
+        return data.format === 'compact' ? decodeCompactSchedule(data) : data.missas;
+    }
+
+    // Mostra na hora a última escala guardada pelo service worker, enquanto a rede responde
+    async function renderFromCache() {
+        if (!('caches' in window)) return;
+        const url = scheduleUrl();
         try {
-            const response = await fetch('/api/missas');
+            const cached = await caches.match(url, { cacheName: DATA_CACHE });
+            if (!cached || hasFreshData) return;
+            const scheduleData = parseSchedule(await cached.json());
+            if (!hasFreshData && url === scheduleUrl()) renderSchedule(scheduleData);
+        } catch (error) {
+            console.error('Falha ao ler a escala guardada:', error);
+        }
+    }
+
+    async function fetchSchedule(url, signal) {
+        try {
+            // O navegador revalida com If-None-Match (ETag); sem mudanças o servidor responde 304 sem corpo
+            const response = await fetch(url, { signal });
             if (!response.ok) {
                 throw new Error(`Erro na API: ${response.statusText}`);
             }
-            const data = await response.json();
-            const scheduleData = data.status === 'sucesso' ? data.missas : [];
+            const scheduleData = parseSchedule(await response.json());
+            if (url !== scheduleUrl()) return;
+            hasFreshData = true;
             renderSchedule(scheduleData);
         } catch (error) {
+            if (error.name === 'AbortError') return;
             console.error("Falha ao carregar dados da escala:", error);
-            scheduleContainer.innerHTML = '<article><p style="color:red; text-align:center;">Erro ao carregar a escala.</p></article>';
+            if (currentSchedule.length > 0) {
+                showFlashMessage('Sem conexão: mostrando a última escala salva.', 'danger');
+            } else {
+                scheduleContainer.innerHTML = '<article><p style="color:red; text-align:center;">Erro ao carregar a escala.</p></article>';
+            }
         }
     }
 
+    function showSchedule() {
+        hasFreshData = false;
+        renderFromCache();
+        return loadScheduleFromAPI();
+    }
+
+    // Atualização otimista: aplica a mudança na tela antes da resposta e devolve uma função para desfazê-la
+    function applyOptimistic(vagaId, changes) {
+        const slot = currentSchedule.flatMap(mass => mass.slots).find(s => String(s.vaga_id) === String(vagaId));
+        if (!slot) return () => {};
+        const previous = { ...slot };
+        // Uma resposta pedida antes desta mudança traria a escala antiga por cima da atualização otimista
+        cancelScheduleLoad();
+        Object.assign(slot, changes);
+        renderSchedule(currentSchedule);
+        return () => {
+            Object.assign(slot, previous);
+            renderSchedule(currentSchedule);
+        };
+    }
+
     // Função para renderizar a escala na página
     function renderSchedule(scheduleData) {
+        currentSchedule = scheduleData;
         scheduleContainer.innerHTML = '';
         if (scheduleData.length === 0) {
-            scheduleContainer.innerHTML = '<article><p>Nenhuma missa encontrada.</p></article>';
+            const emptyMessage = onlyOpportunitiesToggle && onlyOpportunitiesToggle.checked
+                ? 'Nenhuma vaga aberta para as suas habilidades no momento.'
+                : 'Nenhuma missa encontrada.';
+            scheduleContainer.innerHTML = `<article><p>${emptyMessage}</p></article>`;
             return;
         }
 
@@ -99,16 +209,18 @@ document.addEventListener('DOMContentLoaded', () => {
         if (!confirm('Tem certeza que deseja liberar esta vaga e notificar o grupo?')) {
             return;
         }
+        const revert = applyOptimistic(vagaId, { acolyte: null, is_mine: false });
         try {
             const response = await fetch(`/pedir-substituicao/${vagaId}`, { method: 'POST' });
             if (!response.ok) throw new Error('Falha na resposta do servidor.');
-            // Recarrega a escala para mostrar a mudança
-            loadScheduleFromAPI();
             showFlashMessage('Vaga liberada e grupo notificado com sucesso!', 'success');
         } catch (error) {
             console.error('Erro ao liberar vaga:', error);
+            revert();
             showFlashMessage('Ocorreu um erro ao tentar liberar a vaga.', 'danger');
         }
+        // Confirma o estado real com o servidor
+        scheduleReload();
     }
 
     // Função para SE INSCREVER EM UMA VAGA (chama o backend)
@@ -116,21 +228,24 @@ document.addEventListener('DOMContentLoaded', () => {
         if (!confirm('Deseja se inscrever para esta função?')) {
             return;
         }
+        const revert = applyOptimistic(vagaId, { acolyte: 'Você', is_mine: true });
         try {
-            // ATENÇÃO: A rota /api/inscrever-vaga/<vaga_id> precisa ser criada no app.py
             const response = await fetch(`/api/inscrever-vaga/${vagaId}`, { method: 'POST' });
             const data = await response.json();
 
             if (!response.ok || data.status !== 'sucesso') {
                 throw new Error(data.message || 'Não foi possível se inscrever na vaga.');
             }
-            // Recarrega a escala para mostrar seu nome na vaga
-            loadScheduleFromAPI();
+            // Em período de disputa a vaga ainda não é do usuário
+            if (data.disputa) revert();
             showFlashMessage(data.message, 'success');
         } catch (error) {
             console.error('Erro ao se inscrever na vaga:', error);
+            revert();
             showFlashMessage(error.message, 'danger');
         }
+        // Recarrega a escala para confirmar o estado real com o servidor
+        scheduleReload();
     }
 
     // Listener de eventos principal para a escala
@@ -150,6 +265,15 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
-    // Carrega a escala inicial ao abrir a página
-    loadScheduleFromAPI();
+    if (onlyOpportunitiesToggle) {
+        onlyOpportunitiesToggle.addEventListener('change', showSchedule);
+    }
+
+    // Service worker: guarda a página e a última escala para abrir rápido e funcionar sem sinal
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.register('/sw.js').catch(error => console.error('Falha ao registrar o service worker:', error));
+    }
+
+    // Carrega a escala inicial ao abrir a página (primeiro do cache, depois da rede)
+    showSchedule();
 });
\ No newline at end of file
@@ -0,0 +1,83 @@
+// static/sw.js - servido em /sw.js para controlar todas as páginas do site
+
+const SHELL_CACHE = 'escala-shell-v2';
+const DATA_CACHE = 'escala-dados-v1'; // mesmo nome usado em static/script.js
+const API_PATHS = ['/api/missas', '/api/vagas-abertas'];
+// Páginas que funcionam offline; as demais (admin, perfis, login) sempre vêm da rede
+const SHELL_PATHS = ['/', '/minha-escala'];
+
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', (event) => {
+    // Remove caches de versões anteriores do service worker
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys.filter(key => ![SHELL_CACHE, DATA_CACHE].includes(key)).map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+// Só guarda respostas completas da própria aplicação (não o redirecionamento para o login)
+function isCacheable(response) {
+    return response && response.ok && !response.redirected && response.type !== 'error';
+}
+
+// Rede primeiro; se não houver conexão, usa a última resposta guardada
+async function networkFirst(request, cacheName) {
+    const cache = await caches.open(cacheName);
+    try {
+        const response = await fetch(request);
+        if (isCacheable(response)) {
+            cache.put(request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        const cached = await cache.match(request);
+        if (cached) return cached;
+        throw error;
+    }
+}
+
+// Responde do cache na hora e atualiza em segundo plano
+async function staleWhileRevalidate(event, cacheName) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(event.request);
+    const network = fetch(event.request).then(response => {
+        if (isCacheable(response) || response.type === 'opaque') {
+            cache.put(event.request, response.clone());
+        }
+        return response;
+    });
+    if (cached) {
+        event.waitUntil(network.catch(() => {}));
+        return cached;
+    }
+    return network;
+}
+
+// A escala e as páginas guardadas são de um usuário só
+function clearUserCaches() {
+    return Promise.all([caches.delete(DATA_CACHE), caches.delete(SHELL_CACHE)]);
+}
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    const url = new URL(request.url);
+    const sameOrigin = url.origin === self.location.origin;
+
+    // Ao entrar ou sair, apaga o que foi guardado antes de a resposta (e as páginas seguintes) chegar,
+    // para um novo usuário no mesmo navegador nunca ver a escala do anterior
+    if (sameOrigin && ((url.pathname === '/login' && request.method === 'POST') || url.pathname === '/logout')) {
+        event.respondWith(clearUserCaches().then(() => fetch(request)));
+        return;
+    }
+    if (request.method !== 'GET') return;
+
+    if (sameOrigin && API_PATHS.includes(url.pathname)) {
+        event.respondWith(networkFirst(request, DATA_CACHE));
+    } else if (sameOrigin && request.mode === 'navigate' && SHELL_PATHS.includes(url.pathname)) {
+        event.respondWith(networkFirst(request, SHELL_CACHE));
+    } else if (url.pathname.startsWith('/static/') || url.hostname === 'cdn.jsdelivr.net') {
+        event.respondWith(staleWhileRevalidate(event, SHELL_CACHE));
+    }
+});
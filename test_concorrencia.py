@@ -0,0 +1,99 @@
+# test_concorrencia.py
+"""Dispara mais requisições simultâneas do que o pool de conexões comporta (5 + 10 de overflow).
+
+Uso: python test_concorrencia.py [requisicoes_simultaneas]   (ou via pytest)
+
+Cada requisição deve usar uma única conexão do pool, inclusive o limite de requisições;
+se alguma segurar duas, as threads se bloqueiam até o timeout do pool e respondem 500.
+"""
+import os
+import sys
+import tempfile
+import threading
+from collections import Counter
+from datetime import date, timedelta, time as hora
+
+# Banco temporário próprio, configurado antes de importar o app
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'concorrencia.db')
+os.environ['RATE_LIMIT_ENABLED'] = '1'
+
+from app import app, db, Usuario, Missa, Vaga, Habilidade
+
+REQUISICOES_SIMULTANEAS = int(sys.argv[1]) if __name__ == '__main__' and len(sys.argv) > 1 else 30
+
+
+def preparar_banco():
+    with app.app_context():
+        db.create_all()
+        if Usuario.query.filter_by(email='concorrencia@teste.com').first():
+            return
+        habilidade = Habilidade(funcao="Cerimoniário Mor (CM)")
+        usuario = Usuario(nome="Acólito Teste", email="concorrencia@teste.com")
+        usuario.set_password("senha-teste")
+        usuario.habilidades.append(habilidade)
+        db.session.add_all([habilidade, usuario])
+        for i in range(10):
+            missa = Missa(data=date.today() + timedelta(days=i), horario=hora(19, 0))
+            db.session.add(missa)
+            db.session.add(Vaga(habilidade=habilidade, missa=missa))
+        db.session.commit()
+
+
+def disparar_juntas(requisicao, quantidade):
+    """Executa `requisicao(i)` em `quantidade` threads liberadas ao mesmo tempo; devolve a contagem de status."""
+    largada = threading.Barrier(quantidade)
+    status = Counter()
+    lock = threading.Lock()
+
+    def executar(i):
+        largada.wait()
+        codigo = requisicao(i)
+        with lock:
+            status[codigo] += 1
+
+    threads = [threading.Thread(target=executar, args=(i,)) for i in range(quantidade)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return status
+
+
+def test_api_logada_acima_do_pool():
+    preparar_banco()
+    clientes = []
+    for _ in range(REQUISICOES_SIMULTANEAS):
+        cliente = app.test_client()
+        cliente.post('/login', data={'email': 'concorrencia@teste.com', 'password': 'senha-teste'})
+        clientes.append(cliente)
+    status = disparar_juntas(lambda i: clientes[i].get('/api/missas').status_code, REQUISICOES_SIMULTANEAS)
+    print(f"GET /api/missas logado: {dict(status)}")
+    assert 500 not in status and status[200] > 0
+
+
+def test_logins_errados_acima_do_pool():
+    preparar_banco()
+    status = disparar_juntas(
+        lambda i: app.test_client().post('/login', data={'email': f'ninguem{i}@teste.com', 'password': 'errada'},
+                                         headers={'X-Forwarded-For': f'10.0.{i}.1'}).status_code,
+        REQUISICOES_SIMULTANEAS)
+    print(f"POST /login com senha errada: {dict(status)}")
+    assert 500 not in status
+
+
+def test_logins_errados_paralelos_respeitam_o_limite():
+    # O balde por email comporta 5 tentativas erradas; as demais devem ser recusadas mesmo chegando juntas
+    preparar_banco()
+    status = disparar_juntas(
+        lambda i: app.test_client().post('/login', data={'email': 'concorrencia@teste.com', 'password': 'errada'},
+                                         headers={'X-Forwarded-For': f'10.1.{i}.1'}).status_code,
+        7)
+    print(f"POST /login com senha errada para o mesmo email: {dict(status)}")
+    assert status == {200: 5, 429: 2}
+
+
+if __name__ == '__main__':
+    test_api_logada_acima_do_pool()
+    test_logins_errados_acima_do_pool()
+    test_logins_errados_paralelos_respeitam_o_limite()
+    print("Nenhuma requisição falhou por falta de conexão.")